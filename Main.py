@@ -1,13 +1,17 @@
+import logging
+
 from SubtitleDownloader import download_subtitle
-from SubtitleUtils import *
+from SubtitleUtils import rename_subtitles, encode_subtitles
 
 def main():
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     # Test modifying the file
     path = input("Enter the movie directory: ")
     url = input("Enter subtitle download url: ")
-    download_subtitle(url, path)
-    rename_subtitles(path)
-    encode_subtitles(path)
+    # Hand the extracted files straight through instead of rescanning path
+    srt_files = download_subtitle(url, path)
+    srt_files = rename_subtitles(path, srt_files)
+    encode_subtitles(path, srt_files)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
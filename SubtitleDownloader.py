@@ -1,20 +1,222 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import hashlib
+import json
+import logging
+import shutil
+import time
 import zipfile
+import io
 import os
 
+# Archives smaller than this are extracted straight from memory
+IN_MEMORY_ZIP_LIMIT = 4 * 1024 * 1024
+_CLEAN_EXTS = ('.srt', '.zip')
+# Guard against zip bombs; no real subtitle comes close to this
+MAX_MEMBER_SIZE = 50 * 1024 * 1024
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'SubtitleManager')
+CACHE_TTL = 24 * 60 * 60
+CACHE_META_PATH = os.path.join(CACHE_DIR, 'meta.json')
+
+logger = logging.getLogger(__name__)
+
+# Shared across calls so repeated downloads reuse pooled keep-alive connections
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8,
+                       max_retries=Retry(total=3, backoff_factor=0.5))
+_session.mount('https://', _adapter)
+_session.mount('http://', _adapter)
+
+def _cache_path(url):
+    return os.path.join(CACHE_DIR, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.zip')
+
+def _load_cache_meta():
+    try:
+        with open(CACHE_META_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _prune_cache(meta):
+    now = time.time()
+    for url, entry in list(meta.items()):
+        local_zip = entry.get('local_zip', '')
+        try:
+            expired = now - os.path.getmtime(local_zip) > CACHE_TTL
+        except OSError:
+            del meta[url]
+            continue
+        if expired:
+            del meta[url]
+            try:
+                os.remove(local_zip)
+            except OSError:
+                pass
+
+def _save_cache_meta(meta):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    _prune_cache(meta)
+    tmp = CACHE_META_PATH + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, CACHE_META_PATH)
+
+def _parse_cache_control(value):
+    # Returns (cacheable, seconds the cached zip may be used without revalidating)
+    directives = [d.strip().lower() for d in value.split(',')]
+    if 'no-store' in directives:
+        return False, 0
+    if 'no-cache' in directives:
+        return True, 0
+    for d in directives:
+        if d.startswith('max-age='):
+            try:
+                return True, max(0, min(int(d[len('max-age='):]), CACHE_TTL))
+            except ValueError:
+                break
+    return True, CACHE_TTL
+
+def _store_in_cache(cache_path, src):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = cache_path + '.tmp'
+    with open(tmp, 'wb') as f:
+        shutil.copyfileobj(src, f, length=65536)
+    os.replace(tmp, cache_path)
+
+def _update_cache(cache_path, src, meta):
+    # The subtitles are already extracted; an unwritable cache must not fail the run
+    try:
+        if src is not None:
+            _store_in_cache(cache_path, src)
+        _save_cache_meta(meta)
+    except OSError as e:
+        logger.warning('Could not update subtitle cache: %s', e)
+
 def download_subtitle(url, path):
     clean_folder(path)
-    print('Download new subtitle zip file')
-    myfile = requests.get(url)
-    open(path + '/sub.zip', 'wb').write(myfile.content)
-    print('Extract subtitles from zip file')
-    with zipfile.ZipFile(path + '/sub.zip', 'r') as zip_ref:
-        zip_ref.extractall(path)
-    os.remove(path + '/sub.zip')
+    cache_path = _cache_path(url)
+    meta = _load_cache_meta()
+    entry = meta.get(url, {})
+    max_age = entry.get('max_age', CACHE_TTL)
+    if os.path.exists(cache_path) and time.time() - os.path.getmtime(cache_path) < max_age:
+        logger.info('Extract subtitles from cached zip file')
+        with zipfile.ZipFile(cache_path, 'r') as zip_ref:
+            return extract_subtitles(zip_ref, path)
+
+    headers = {}
+    if os.path.exists(entry.get('local_zip', '')):
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    logger.info('Download new subtitle zip file')
+    with _session.get(url, headers=headers, stream=True, timeout=(5, 30)) as r:
+        if r.status_code == 304:
+            # Only trust a 304 when we actually asked for revalidation
+            if not headers:
+                raise requests.HTTPError('Unexpected 304 for unconditional request', response=r)
+            logger.info('Subtitle zip not modified, extract from cached zip file')
+            if 'Cache-Control' in r.headers:
+                entry['max_age'] = _parse_cache_control(r.headers['Cache-Control'])[1]
+            try:
+                os.utime(entry['local_zip'])
+            except OSError as e:
+                logger.warning('Could not update subtitle cache: %s', e)
+            with zipfile.ZipFile(entry['local_zip'], 'r') as zip_ref:
+                srt_files = extract_subtitles(zip_ref, path)
+            _update_cache(cache_path, None, meta)
+            return srt_files
+        r.raise_for_status()
+        r.raw.decode_content = True
+        cacheable, max_age = _parse_cache_control(r.headers.get('Cache-Control', ''))
+        if cacheable:
+            meta[url] = {
+                'etag': r.headers.get('ETag'),
+                'last_modified': r.headers.get('Last-Modified'),
+                'local_zip': cache_path,
+                'max_age': max_age,
+            }
+        try:
+            content_length = int(r.headers['Content-Length'])
+        except (KeyError, ValueError):
+            # Unknown or malformed size: take the disk-streaming path
+            content_length = None
+        # With a Content-Encoding the wire size says nothing about the decoded size
+        encoded = r.headers.get('Content-Encoding', 'identity').lower() != 'identity'
+        if not encoded and content_length is not None and content_length < IN_MEMORY_ZIP_LIMIT:
+            buf = io.BytesIO()
+            shutil.copyfileobj(r.raw, buf, length=65536)
+            buf.seek(0)
+            logger.info('Extract subtitles from zip file')
+            with zipfile.ZipFile(buf, 'r') as zip_ref:
+                srt_files = extract_subtitles(zip_ref, path)
+            if cacheable:
+                buf.seek(0)
+                _update_cache(cache_path, buf, meta)
+            return srt_files
+        zip_file_path = os.path.join(path, 'sub.zip')
+        try:
+            with open(zip_file_path, 'wb') as f:
+                shutil.copyfileobj(r.raw, f, length=65536)
+            logger.info('Extract subtitles from zip file')
+            with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
+                srt_files = extract_subtitles(zip_ref, path)
+            if cacheable:
+                with open(zip_file_path, 'rb') as f:
+                    _update_cache(cache_path, f, meta)
+            return srt_files
+        finally:
+            if os.path.exists(zip_file_path):
+                os.remove(zip_file_path)
+
+def _unique_name(name, written):
+    # Flattening can map e.g. English/Film.srt and Arabic/Film.srt to one name
+    stem, ext = os.path.splitext(name)
+    counter = 1
+    while name.lower() in written:
+        name = f'{stem}.{counter}{ext}'
+        counter += 1
+    written.add(name.lower())
+    return name
+
+def extract_subtitles(zip_ref, path):
+    srt_files = []
+    written = set()
+    root = os.path.realpath(path)
+    for info in zip_ref.infolist():
+        if info.is_dir():
+            continue
+        # ZipExtFile never yields more than file_size bytes, so this bounds the output
+        if info.file_size > MAX_MEMBER_SIZE:
+            logger.warning('Skip oversized zip member %s (%d bytes)', info.filename, info.file_size)
+            continue
+        # Flatten member paths so entries like '../x.srt' can't escape path, then
+        # check the final name, which is the one actually opened for writing
+        target = os.path.join(path, _unique_name(os.path.basename(info.filename), written))
+        if not os.path.realpath(target).startswith(root + os.sep):
+            logger.warning('Skip unsafe zip member %s', info.filename)
+            continue
+        with zip_ref.open(info) as src, open(target, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 65536)
+        if target.lower().endswith('.srt'):
+            srt_files.append(target)
+    return srt_files
+
+def _iter_clean_targets(path):
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_clean_targets(entry.path)
+            elif entry.name.lower().endswith(_CLEAN_EXTS):
+                yield entry.path
 
 def clean_folder(path):
-    print('Delete all *.srt and *.zip in directory {}'.format(path))
-    for r, d, f in os.walk(path, topdown=True):
-        for file in f:
-                if file.endswith('.srt') or file.endswith('.zip'):
-                    os.remove(os.path.join(path, file))
+    logger.info('Delete all *.srt and *.zip in directory %s', path)
+    # Materialize first so removals don't race the open scandir iterators
+    for file_path in list(_iter_clean_targets(path)):
+        try:
+            os.remove(file_path)
+        except OSError as e:
+            logger.warning('Could not delete %s: %s', file_path, e)
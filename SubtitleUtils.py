@@ -1,65 +1,173 @@
 import codecs
 import os
+import logging
+import mmap
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
 def get_subtitle_encoding(subtitle_file):
 
+    with open(subtitle_file, 'rb') as f:
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                # A BOM answers the question without copying the sample out
+                if mm[:len(codecs.BOM_UTF8)] == codecs.BOM_UTF8:
+                    return 'utf-8'
+                raw = mm[:65536]
+        except (ValueError, OSError):
+            # mmap refuses empty files and some special filesystems
+            raw = f.read(65536)
+    return _detect_encoding(raw, truncated=len(raw) == 65536)
+
+def _detect_encoding(raw, truncated=False):
+    # SRT files open with ASCII numbering and timestamps, so check the whole buffer
+    if raw.startswith(codecs.BOM_UTF8) or raw.isascii():
+        return 'utf-8'
+    try:
+        # final=False when sampled so a multi-byte char cut at the end isn't an error
+        codecs.getincrementaldecoder('utf-8')().decode(raw, final=not truncated)
+    except UnicodeDecodeError:
+        pass
+    else:
+        return 'utf-8'
+    try:
+        # Optional: without it we fall back to probing the known encodings
+        import charset_normalizer
+    except ImportError:
+        best = None
+    else:
+        best = charset_normalizer.from_bytes(raw).best()
+    if best is not None:
+        # Normalize names like 'utf_8' so callers can compare against 'utf-8'
+        e = codecs.lookup(best.encoding).name
+        logger.debug('opening the file with encoding: %s', e)
+        return e
+
     encodings = ['utf-8', 'windows-1256', 'iso-8859-7']
     for e in encodings:
         try:
-            fh = codecs.open(subtitle_file, 'r', encoding=e)
-            fh.readlines()
-            fh.seek(0)
+            raw.decode(e)
         except UnicodeDecodeError:
-            print('got unicode error with %s , trying different encoding' % e)
+            logger.debug('got unicode error with %s, trying different encoding', e)
         else:
-            print('opening the file with encoding:  %s ' % e)
+            logger.debug('opening the file with encoding: %s', e)
             return e
     return 'not_detected'
 
-def rename_subtitles(path):
-    for r, d, f in os.walk(path, topdown=True):
-        for file in f:
-            print(file)
-            if file.endswith('.mp4') or file.endswith('.mkv') or file.endswith('.avi') :
-                filename_without_ext = os.path.splitext(file)[0]
-    srtCounter = 0
-    for root, dirs, files in os.walk(path, topdown=True):
-        for file in files:
-            if file.endswith('.srt'):
-                srtCounter += 1
+MOVIE_EXTS = ('.mp4', '.mkv', '.avi', '.mov', '.m4v')
 
-    try:
-        filename_without_ext
-    except NameError:
-        print("Movie file is not existing")
+def iter_subs(root):
+    for p in Path(root).rglob('*'):
+        if p.suffix.lower() == '.srt' and p.is_file():
+            yield p
+
+def iter_videos(root):
+    # One rglob over everything rather than one per extension
+    for p in Path(root).rglob('*'):
+        if p.suffix.lower() in MOVIE_EXTS and p.is_file():
+            yield p
+
+def find_movie_stem(path):
+    # The movie normally sits directly in path; only walk the tree if it doesn't
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.name.lower().endswith(MOVIE_EXTS) and entry.is_file():
+                return os.path.splitext(entry.name)[0]
+    movie = next(iter_videos(path), None)
+    return movie.stem if movie is not None else None
+
+def rename_subtitles(path, srt_files=None):
+    if srt_files is None:
+        srt_files = list(iter_subs(path))
+
+    movie_stem = find_movie_stem(path)
+    if movie_stem is None:
+        logger.warning("Movie file is not existing")
+        return srt_files
+
+    srt_files = list(dict.fromkeys(os.fspath(p) for p in srt_files))
+    base = os.path.join(path, movie_stem)
+    srtCounter = len(srt_files)
+    if srtCounter == 1:
+        targets = [base + '.srt']
     else:
-        counter = 1
-        for root, dirs, files in os.walk(path, topdown=True):
-            for file in files:
-                if file.endswith('.srt'):
-                    if srtCounter == 1:
-                        os.rename(os.path.join(path, file), os.path.join(path, filename_without_ext + '.srt'))
-                    else:
-                        os.rename(os.path.join(path, file), os.path.join(path, filename_without_ext + '.' + str(counter) + '.srt'))
-                    counter += 1
-
-
-def encode_subtitles(path):
-    # path = 'C:/Personal/Movies/'
-    for root, dirs, files in os.walk(path, topdown=True):
-        for file in files:
-            if file.endswith('.srt'):
-                encoding = get_subtitle_encoding(path + '/' + file)
+        targets = [f'{base}.{counter}.srt' for counter in range(1, srtCounter + 1)]
+
+    # A target can be a source still waiting its turn (Film.srt -> Film.1.srt
+    # while Film.1.srt is next), so move everything aside before the final names
+    staged = []
+    for i, srt_file in enumerate(srt_files):
+        tmp = f'{srt_file}.{i}.renaming'
+        os.rename(srt_file, tmp)
+        staged.append(tmp)
+    for tmp, target in zip(staged, targets):
+        os.rename(tmp, target)
+    return [Path(target) for target in targets]
+
+
+def _is_utf8(subtitle_full_path):
+    # Validate in 64 KiB chunks so already-UTF-8 files never get decoded as a whole
+    dec = codecs.getincrementaldecoder('utf-8')('strict')
+    try:
+        with open(subtitle_full_path, 'rb') as f:
+            while chunk := f.read(65536):
+                dec.decode(chunk)
+        dec.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+def _recode_one(subtitle_full_path):
+    subtitle_full_path = os.fspath(subtitle_full_path)
+    if _is_utf8(subtitle_full_path):
+        return
+
+    with open(subtitle_full_path, 'rb') as f:
+        raw = f.read()
 
-                if(encoding == 'not_detected'):
-                    print('Can not encode this subtitle file')
+    encodings = ['windows-1256', 'iso-8859-7']
+    detected = _detect_encoding(raw)
+    # Single-byte codecs decode anything, so a detection outside the known
+    # candidates (e.g. mac-iceland for short Arabic files) would go unchecked.
+    # Use it only to pick among the candidates; otherwise keep the usual order.
+    if detected not in ('utf-8', 'not_detected'):
+        detected = codecs.lookup(detected).name
+        preferred = [e for e in encodings if codecs.lookup(e).name == detected]
+        encodings = preferred + [e for e in encodings if e not in preferred]
+
+    for e in encodings:
+        try:
+            data = raw.decode(e)
+        except UnicodeDecodeError:
+            logger.debug('got unicode error with %s, trying different encoding', e)
+        else:
+            logger.info('converting %s from %s to utf-8', subtitle_full_path, e)
+            # Write beside the original and swap it in so a crash can't truncate it
+            tmp = subtitle_full_path + '.tmp'
+            try:
+                with open(tmp, 'wb') as f:
+                    f.write(data.encode('utf-8'))
+                os.replace(tmp, subtitle_full_path)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+            return
+    logger.warning('Can not encode this subtitle file %s', subtitle_full_path)
+
+def encode_subtitles(path, srt_files=None):
+    # path = 'C:/Personal/Movies/'
+    if srt_files is None:
+        srt_files = list(iter_subs(path))
 
-                if(encoding != 'utf-8'):
-                    with codecs.open(path + '/' + file, "r", "windows-1256") as myfile:
-                        data = myfile.read()
-                        file = codecs.open(path + '/' + file, "w", "utf-8")
-                        file.write(data)
+    # Per-file work is open/read/write bound and releases the GIL
+    with ThreadPoolExecutor(max_workers=min(8, (os.cpu_count() or 1) * 2)) as ex:
+        list(ex.map(_recode_one, srt_files))
 
 def main():
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     path = input("Enter the movie directory: ")
     encode_subtitles(path)
 